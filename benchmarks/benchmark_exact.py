@@ -0,0 +1,83 @@
+"""Benchmark exact segmentation against chunked segmentation.
+
+Inputs are built by joining random words from `wordsegment.WORDS`. For each
+size, report the throughput of both modes and the agreement of their word
+boundaries.
+
+    $ python benchmarks/benchmark_exact.py --sizes 10000 100000 1000000
+
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import wordsegment  # pylint: disable=wrong-import-position
+
+
+def make_text(size, seed=0):
+    "Return text of at least `size` letters made of random words."
+    rand = random.Random(seed)
+    words = wordsegment.WORDS
+    parts = []
+    length = 0
+    while length < size:
+        word = rand.choice(words)
+        parts.append(word)
+        length += len(word)
+    return ''.join(parts)[:size]
+
+
+def boundaries(words):
+    "Return set of offsets where `words` are divided."
+    offsets = set()
+    offset = 0
+    for word in words:
+        offset += len(word)
+        offsets.add(offset)
+    return offsets
+
+
+def timed(func, *args, **kwargs):
+    "Return `(seconds, result)` pair of calling `func`."
+    start = time.time()
+    result = func(*args, **kwargs)
+    return time.time() - start, result
+
+
+def main(arguments=None):
+    "Run benchmark and print results table."
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=[10000, 100000, 1000000])
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(arguments)
+
+    wordsegment.load()
+    segment = wordsegment.segment
+
+    template = '{0:>10} {1:>14} {2:>14} {3:>10}'
+    print(template.format('size', 'chunked KB/s', 'exact KB/s', 'agreement'))
+
+    for size in args.sizes:
+        text = make_text(size, args.seed)
+        chunked_time, chunked = timed(segment, text)
+        exact_time, exact = timed(segment, text, exact=True)
+        chunked_bounds = boundaries(chunked)
+        exact_bounds = boundaries(exact)
+        shared = len(chunked_bounds & exact_bounds)
+        agreement = shared / float(len(chunked_bounds | exact_bounds))
+        print(template.format(
+            size,
+            '{0:.1f}'.format(size / 1024.0 / chunked_time),
+            '{0:.1f}'.format(size / 1024.0 / exact_time),
+            '{0:.4f}'.format(agreement),
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,10 @@
+import math
 import os
 import sys
 from .context import wordsegment
 from wordsegment import (
     clean, load, main, isegment, segment, UNIGRAMS, BIGRAMS, WORDS,
+    Decoder, Segmenter, _segmenter,
 )
 
 load()
@@ -16,6 +18,10 @@ def test_bigrams():
 def test_clean():
     assert clean("Can't buy me love!") == 'cantbuymelove'
 
+def test_divide():
+    pairs = list(_segmenter.divide('test'))
+    assert pairs == [('t', 'est'), ('te', 'st'), ('tes', 't'), ('test', '')]
+
 def test_segment_0():
     result = ['choose', 'spain']
     assert segment(''.join(result)) == result
@@ -93,6 +99,74 @@ def test_segment_12():
     ]
     assert segment(''.join(result)) == result
 
+def test_segment_13():
+    result = ['it', 'is', 'a', 'truth', 'universally', 'acknowledged'] * 20
+    assert segment(''.join(result)) == result
+
+def test_search():
+    score, words = _segmenter.search('thisisatest')
+    assert words == ['this', 'is', 'a', 'test']
+    assert score < 0.0
+    assert _segmenter.search('') == (0.0, [])
+
+def test_segment_exact():
+    result = ['it', 'is', 'a', 'truth', 'universally', 'acknowledged'] * 50
+    assert segment(''.join(result), exact=True) == result
+    assert segment('', exact=True) == []
+
+def test_segment_exact_context():
+    text = 'dewdroprevivificationexcavatedjewelweedsinsensiblenessinstanter'
+    assert segment(text)[-4:] == ['insensible', 'ness', 'instant', 'er']
+    assert segment(text, exact=True)[-5:] == [
+        'in', 'sensible', 'ness', 'instant', 'er'
+    ]
+
+def test_decoder():
+    decoder = Decoder(_segmenter)
+    words = list(decoder.feed('itwasthebestoftimes' * 10))
+    words.extend(decoder.flush())
+    assert words == ['it', 'was', 'the', 'best', 'of', 'times'] * 10
+    assert decoder.position == 0
+
+def test_decoder_window():
+    _segmenter.WINDOW = 0
+    try:
+        decoder = Decoder(_segmenter)
+        words = list(decoder.feed('a' * 300))
+        assert decoder.position - decoder.root[1] <= 2 * _segmenter.limit
+        words.extend(decoder.flush())
+        assert ''.join(words) == 'a' * 300
+    finally:
+        del _segmenter.WINDOW
+
+def test_prepare():
+    assert segment('grantjenks') == ['grant', 'jenks']
+    UNIGRAMS['grantjenks'] = 1e9
+    try:
+        assert segment('grantjenks') == ['grantjenks']
+    finally:
+        del UNIGRAMS['grantjenks']
+    assert segment('grantjenks') == ['grant', 'jenks']
+
+def test_tables():
+    unigram_scores, bigram_scores, penalties = _segmenter.tables()
+    assert unigram_scores['the'] == math.log10(_segmenter.score('the'))
+    in_the = math.log10(_segmenter.score('the', 'in'))
+    assert bigram_scores['in']['the'] == in_the
+    assert penalties[5] == math.log10(_segmenter.score('qzqzq'))
+
+def test_score():
+    assert _segmenter.score('the', 'qzqzq') == _segmenter.score('the')
+    assert _segmenter.score('the', 'in') > _segmenter.score('the')
+
+def test_load_index():
+    segmenter = Segmenter()
+    segmenter.load(index=True)
+    result = ['now', 'is', 'the', 'time', 'for', 'all', 'good']
+    assert segmenter.segment(''.join(result)) == result
+    result = ['far', 'out', 'in', 'the', 'uncharted', 'backwaters', 'qzqzq']
+    assert segmenter.segment(''.join(result)) == result
+
 def test_main():
     main(['tests/test.txt'])
     result = os.linesep.join(('choose spain', 'this is a test')) + os.linesep
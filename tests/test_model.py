@@ -0,0 +1,108 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+from .context import wordsegment
+from wordsegment import Segmenter, main
+from wordsegment.model import Model
+
+_segmenter = Segmenter()
+_segmenter.load()
+segment = _segmenter.segment
+
+directory = tempfile.mkdtemp()
+filename = os.path.join(directory, 'model.bin')
+_segmenter.compile(filename)
+
+segmenter = Segmenter()
+segmenter.MODEL_FILENAME = filename
+segmenter.load(mmap=True)
+
+def teardown_module():
+    shutil.rmtree(directory)
+
+def test_unigrams():
+    unigrams = segmenter.unigrams
+    assert len(unigrams) == len(_segmenter.unigrams)
+    assert unigrams['the'] == _segmenter.unigrams['the']
+    assert unigrams.get('qzqzq') is None
+    assert unigrams.get('the') == unigrams['the']
+    assert 'test' in unigrams
+    assert '<s>' not in unigrams
+    with pytest.raises(KeyError):
+        unigrams['<s>']
+    assert sorted(unigrams)[:3] == sorted(_segmenter.unigrams)[:3]
+
+def test_bigrams():
+    bigrams = segmenter.bigrams
+    assert len(bigrams) == len(_segmenter.bigrams)
+    assert bigrams['in the'] == _segmenter.bigrams['in the']
+    assert bigrams['<s> where'] == _segmenter.bigrams['<s> where']
+    assert 'zzz aa' not in bigrams
+    assert 'qzqzq the' not in bigrams
+    with pytest.raises(KeyError):
+        bigrams['zzz aa']
+    assert next(iter(bigrams)) in _segmenter.bigrams
+
+def test_words():
+    words = segmenter.words
+    assert len(words) == len(_segmenter.words)
+    assert words[0] == 'aa'
+    assert words[-1] == 'zzz'
+    assert words[1:3] == _segmenter.words[1:3]
+    with pytest.raises(IndexError):
+        words[len(words)]
+
+def test_tables():
+    unigram_scores, bigram_scores, penalties = segmenter.tables()
+    expected = _segmenter.tables()
+    assert unigram_scores['the'] == expected[0]['the']
+    assert len(unigram_scores) == len(expected[0])
+    assert 'qzqzq' not in unigram_scores
+    with pytest.raises(KeyError):
+        unigram_scores['qzqzq']
+    assert next(iter(unigram_scores)) in expected[0]
+    row = bigram_scores['in']
+    assert row['the'] == expected[1]['in']['the']
+    assert len(row) == len(expected[1]['in'])
+    assert set(row) == set(expected[1]['in'])
+    assert 'in' in row and 'qzqzq' not in row
+    with pytest.raises(KeyError):
+        row['qzqzq']
+    assert row.get('zzz') is None
+    assert '<s>' not in bigram_scores
+    assert bigram_scores.get(None) is None
+    with pytest.raises(KeyError):
+        bigram_scores['<s>']
+    assert len(bigram_scores) == len(expected[1])
+    assert penalties == expected[2]
+
+def test_segment():
+    result = ['far', 'out', 'in', 'the', 'uncharted', 'backwaters', 'qzqzq']
+    text = ''.join(result)
+    assert segmenter.segment(text) == result
+    assert segmenter.segment(text, exact=True) == result
+    text = 'dewdroprevivificationexcavatedjewelweedsinsensiblenessinstanter'
+    assert segmenter.segment(text) == segment(text)
+
+def test_load_index():
+    indexed = Segmenter()
+    indexed.MODEL_FILENAME = filename
+    indexed.load(index=True, mmap=True)
+    result = ['now', 'is', 'the', 'time', 'for', 'all', 'good']
+    assert indexed.segment(''.join(result)) == result
+
+def test_bad_model():
+    path = os.path.join(directory, 'bad.bin')
+    with open(path, 'wb') as writer:
+        writer.write(b'\0' * 1024)
+    with pytest.raises(ValueError):
+        Model(path)
+
+def test_main_compile():
+    path = os.path.join(directory, 'main.bin')
+    main(['compile', path])
+    with open(path, 'rb') as reader, open(filename, 'rb') as expected:
+        assert reader.read() == expected.read()
@@ -31,6 +31,35 @@ import math
 import os.path as op
 import sys
 
+from collections import deque
+
+INFINITY = float('inf')
+
+
+def _penalties(total, limit):
+    "Return log10 scores of unknown words indexed by length up to `limit`."
+    return [
+        math.log10(10.0 / (total * 10 ** length))
+        for length in range(limit + 1)
+    ]
+
+
+def _best(row, unknown, candidates):
+    """Return best `(score, stop)` pair of `unknown` pair and `candidates`
+    following a word with bigram scores `row`.
+
+    """
+    best_score, best_stop = unknown
+
+    for stop, word, word_score, suffix_score in candidates:
+        candidate_score = row.get(word, word_score) + suffix_score
+        if candidate_score > best_score or (
+                candidate_score == best_score and stop > best_stop):
+            best_score = candidate_score
+            best_stop = stop
+
+    return best_score, best_stop
+
 
 class Segmenter(object):
     """Segmenter
@@ -49,10 +78,15 @@ class Segmenter(object):
     )
     TOTAL = 1024908267229.0
     LIMIT = 24
+    WINDOW = 1000
     WORDS_FILENAME = op.join(
         op.dirname(op.realpath(__file__)),
         'words.txt',
     )
+    MODEL_FILENAME = op.join(
+        op.dirname(op.realpath(__file__)),
+        'model.bin',
+    )
 
 
     def __init__(self):
@@ -61,10 +95,44 @@ class Segmenter(object):
         self.total = 0.0
         self.limit = 0
         self.words = []
+        self._signature = None
+        self._unigram_scores = {}
+        self._bigram_scores = {}
+        self._penalties = []
+        self._indexed = False
+        self._index = None
+
+
+    def load(self, index=False, mmap=False):
+        """Load unigram and bigram counts from disk.
+
+        When `index` is true, also build a prefix index of known words so
+        segmentation skips prefixes that begin no word. The index trades
+        memory for speed.
+
+        When `mmap` is true, memory-map the binary model at `MODEL_FILENAME`
+        written by `compile` rather than parsing text files. Counts and words
+        become read-only views of the model and processes mapping the same
+        file share its memory. Requires Python 3.
+
+        """
+        self._indexed = index
+
+        if mmap:
+            from .model import Model
+            model = Model(self.MODEL_FILENAME)
+            self.unigrams = model.unigrams
+            self.bigrams = model.bigrams
+            self.total = model.total
+            self.limit = model.limit
+            self.words = model.words
+            self._unigram_scores = model.unigram_scores
+            self._bigram_scores = model.bigram_scores
+            self._penalties = _penalties(self.total, self.limit)
+            self._prepare_index()
+            self._signature = self._state()
+            return
 
-
-    def load(self):
-        "Load unigram and bigram counts from disk."
         self.unigrams.update(self.parse(self.UNIGRAMS_FILENAME))
         self.bigrams.update(self.parse(self.BIGRAMS_FILENAME))
         self.total = self.TOTAL
@@ -72,6 +140,105 @@ class Segmenter(object):
         with io.open(self.WORDS_FILENAME, encoding='utf-8') as reader:
             text = reader.read()
             self.words.extend(text.splitlines())
+        self.prepare()
+
+
+    def compile(self, filename=None):
+        """Write binary model of counts, scores and words to `filename`.
+
+        Defaults to `MODEL_FILENAME`. Load it with `load(mmap=True)`.
+
+        """
+        from .model import write
+        write(self, self.MODEL_FILENAME if filename is None else filename)
+
+
+    def prepare(self):
+        """Precompute log10 score tables from unigram and bigram counts.
+
+        Called by `load` and whenever the size of the counts or the total
+        changes. Call again after changing an existing count in place.
+
+        """
+        unigrams = self.unigrams
+        total = self.total
+        log10 = math.log10
+
+        self._unigram_scores = dict(
+            (word, log10(count / total)) for word, count in unigrams.items()
+        )
+
+        # Conditional scores are nested by previous word so lookups need no
+        # string formatting. As in `score`, bigrams only apply when the
+        # previous word is a known unigram.
+
+        unigram_scores = self._unigram_scores
+        bigram_scores = {}
+
+        for bigram, count in self.bigrams.items():
+            previous, word = bigram.split(' ', 1)
+            if previous in unigrams:
+                previous_score = unigrams[previous] / total
+                row = bigram_scores.setdefault(previous, {})
+                row[word] = log10(count / total / previous_score)
+
+        self._bigram_scores = bigram_scores
+
+        penalties = self._penalties = _penalties(total, self.limit)
+
+        # Words found only in bigrams are known too but score as unknown
+        # words when no bigram applies.
+
+        for row in bigram_scores.values():
+            for word in row:
+                if word not in unigram_scores and len(word) <= self.limit:
+                    unigram_scores[word] = penalties[len(word)]
+
+        self._prepare_index()
+        self._signature = self._state()
+
+
+    def _prepare_index(self):
+        """Build prefix index of known words if enabled by `load`.
+
+        The index maps every prefix of a known word to its score, or to None
+        when the prefix is not a word itself.
+
+        """
+        if not self._indexed:
+            self._index = None
+            return
+
+        unigram_scores = self._unigram_scores
+        index = {}
+        for word in unigram_scores:
+            for stop in range(1, len(word)):
+                index.setdefault(word[:stop], None)
+        index.update(unigram_scores)
+        self._index = index
+
+
+    def _state(self):
+        "Return signature of counts used to detect stale score tables."
+        unigrams = self.unigrams
+        bigrams = self.bigrams
+        return (
+            id(unigrams), len(unigrams), id(bigrams), len(bigrams),
+            self.total, self.limit,
+        )
+
+
+    def tables(self):
+        """Return `(unigram_scores, bigram_scores, penalties)` log10 score
+        tables, preparing them if the counts have changed.
+
+        Unigram scores include every known word. Bigram scores are nested
+        by previous word. Penalties are indexed by unknown word length.
+
+        """
+        if self._signature != self._state():
+            self.prepare()
+        return self._unigram_scores, self._bigram_scores, self._penalties
 
 
     @staticmethod
@@ -116,35 +283,118 @@ class Segmenter(object):
         return self.score(word)
 
 
-    def isegment(self, text):
-        "Return iterator of words that is the best segmenation of `text`."
-        memo = dict()
+    def search(self, text, previous='<s>'):
+        """Return `(score, words)` pair that is the best segmentation of `text`
+        given `previous` word.
+
+        """
+        size = len(text)
 
-        def search(text, previous='<s>'):
-            "Return max of candidates matching `text` given `previous` word."
-            if text == '':
-                return 0.0, []
+        if not size:
+            return 0.0, []
 
-            def candidates():
-                "Generator of (score, words) pairs for all divisions of text."
-                for prefix, suffix in self.divide(text):
-                    prefix_score = math.log10(self.score(prefix, previous))
+        limit = self.limit
+        unigram_scores, bigram_scores, penalties = self.tables()
+        index = self._index
+        lookup = unigram_scores.get if index is None else index.get
+        missing = None if index is None else False
+        empty = {}
 
-                    pair = (suffix, prefix)
-                    if pair not in memo:
-                        memo[pair] = search(suffix, prefix)
-                    suffix_score, suffix_words = memo[pair]
+        # Words without bigrams score the next word alike so they share one
+        # state. Only known words with bigrams need a state of their own.
+        # Fill tables from the end of `text` towards the beginning. At each
+        # position, `free_scores` holds the best score of the remaining text
+        # after a word without bigrams, `unknowns` holds the best `(score,
+        # stop)` pair starting with an unknown word and `candidates` holds
+        # `(stop, word, word_score, suffix_score)` tuples of known words.
 
-                    yield (prefix_score + suffix_score, [prefix] + suffix_words)
+        free_scores = [0.0] * (size + 1)
+        unknowns = [(0.0, size)] * (size + 1)
+        candidates = [()] * (size + 1)
 
-            return max(candidates())
+        for pos in range(size - 1, -1, -1):
+            end = min(size, pos + limit)
+            found = []
 
-        # Avoid recursion limit issues by dividing text into chunks, segmenting
-        # those chunks and combining the results together. Chunks may divide
-        # words in the middle so prefix chunks with the last five words of the
-        # previous result.
+            for stop in range(pos + 1, end + 1):
+                word = text[pos:stop]
+                word_score = lookup(word, missing)
 
+                if word_score is None:
+                    continue
+                if word_score is False:
+                    break
+
+                row = bigram_scores.get(word)
+
+                if row is None:
+                    suffix_score = free_scores[stop]
+                else:
+                    suffix_score, _ = _best(row, unknowns[stop], candidates[stop])
+
+                found.append((stop, word, word_score, suffix_score))
+
+            known = set(stop for stop, _, _, _ in found)
+            best_score = -INFINITY
+            best_stop = pos
+
+            # Stops are ordered by length so ties favor the longer prefix,
+            # matching the ordering of `(score, words)` pairs.
+
+            for stop in range(pos + 1, end + 1):
+                if stop not in known:
+                    unknown_score = penalties[stop - pos] + free_scores[stop]
+                    if unknown_score >= best_score:
+                        best_score = unknown_score
+                        best_stop = stop
+
+            unknowns[pos] = (best_score, best_stop)
+            candidates[pos] = found
+            free_scores[pos], _ = _best(empty, unknowns[pos], found)
+
+        row = bigram_scores.get(previous, empty)
+        best_score, stop = _best(row, unknowns[0], candidates[0])
+        words = []
+        pos = 0
+
+        while True:
+            word = text[pos:stop]
+            words.append(word)
+            pos = stop
+
+            if pos == size:
+                break
+
+            row = bigram_scores.get(word, empty)
+            _, stop = _best(row, unknowns[pos], candidates[pos])
+
+        return best_score, words
+
+
+    def isegment(self, text, exact=False):
+        """Return iterator of words that is the best segmenation of `text`.
+
+        When `exact` is true, segment the whole text in a single pass rather
+        than in overlapping chunks. Words are yielded as soon as every
+        surviving segmentation agrees on them.
+
+        """
         clean_text = self.clean(text)
+
+        if exact:
+            decoder = Decoder(self)
+            for word in decoder.feed(clean_text):
+                yield word
+            for word in decoder.flush():
+                yield word
+            return
+
+        search = self.search
+
+        # Divide text into chunks, segmenting those chunks and combining the
+        # results together. Chunks may divide words in the middle so prefix
+        # chunks with the last five words of the previous result.
+
         size = 250
         prefix = ''
 
@@ -162,9 +412,9 @@ class Segmenter(object):
             yield word
 
 
-    def segment(self, text):
+    def segment(self, text, exact=False):
         "Return list of words that is the best segmenation of `text`."
-        return list(self.isegment(text))
+        return list(self.isegment(text, exact))
 
 
     def divide(self, text):
@@ -182,6 +432,184 @@ class Segmenter(object):
         return ''.join(letters)
 
 
+def _top(table):
+    "Return node with the best score in `table` or None when empty."
+    best_node = None
+    for node in table.values():
+        if best_node is None or node[0] > best_node[0]:
+            best_node = node
+    return best_node
+
+
+class Decoder(object):
+    """Decoder
+
+    Incremental Viterbi decoding of cleaned text. Text is consumed left to
+    right and only the states of the last `limit` positions are kept.
+    Segmentations are linked lists of `[score, end, word, parent]` nodes so
+    words are final once every surviving node shares them as an ancestor.
+
+    States at each position are keyed by words with bigram scores. Words
+    without bigrams score the next word alike so they share the `None` key.
+
+    """
+    def __init__(self, segmenter, previous='<s>'):
+        self.segmenter = segmenter
+        self.limit = segmenter.limit
+        self.window = segmenter.WINDOW
+        self.reset(previous)
+
+
+    def reset(self, previous='<s>'):
+        "Discard all state and start decoding after `previous` word."
+        self.root = [0.0, 0, previous, None]
+        self.position = 0
+        self.buffer = ''
+        self.states = deque([{previous: self.root}], maxlen=self.limit)
+        self.bests = deque([self.root], maxlen=self.limit)
+
+
+    def feed(self, text):
+        "Consume `text` and yield words that can no longer change."
+        limit = self.limit
+        unigram_scores, bigram_scores, penalties = self.segmenter.tables()
+        empty = {}
+        states = self.states
+        bests = self.bests
+        buffer = self.buffer
+        position = self.position
+
+        for letter in text:
+            buffer = (buffer + letter)[-limit:]
+            position += 1
+            table = {}
+            free_score = -INFINITY
+            free_word = free_node = None
+
+            for length in range(1, len(buffer) + 1):
+                word = buffer[-length:]
+                word_score = unigram_scores.get(word)
+
+                if word_score is None:
+                    best_node = bests[-length]
+                    if best_node is not None:
+                        node_score = best_node[0] + penalties[length]
+                        if node_score > free_score:
+                            free_score = node_score
+                            free_word = word
+                            free_node = best_node
+                    continue
+
+                best_score = -INFINITY
+                best_node = None
+
+                for key, node in states[-length].items():
+                    row = bigram_scores.get(key, empty)
+                    node_score = node[0] + row.get(word, word_score)
+
+                    if node_score > best_score:
+                        best_score = node_score
+                        best_node = node
+
+                if best_node is None:
+                    continue
+
+                if word in bigram_scores:
+                    table[word] = [best_score, position, word, best_node]
+                elif best_score > free_score:
+                    free_score = best_score
+                    free_word = word
+                    free_node = best_node
+
+            if free_node is not None:
+                table[None] = [free_score, position, free_word, free_node]
+
+            states.append(table)
+            bests.append(_top(table))
+
+            if position % limit == 0:
+                self.buffer = buffer
+                self.position = position
+
+                for word in self.commit(self.converge()):
+                    yield word
+
+                if position - self.root[1] > self.window:
+                    for word in self.commit(self.truncate()):
+                        yield word
+
+        self.buffer = buffer
+        self.position = position
+
+
+    def flush(self):
+        "Return remaining words of the best segmentation and reset."
+        words = self.commit(self.bests[-1])
+        self.reset()
+        return words
+
+
+    def converge(self):
+        "Return the latest node shared by every surviving segmentation."
+        nodes = dict(
+            (id(node), node)
+            for table in self.states
+            for node in table.values()
+        )
+
+        while len(nodes) > 1:
+            end = max(node[1] for node in nodes.values())
+
+            for key, node in list(nodes.items()):
+                if node[1] == end:
+                    del nodes[key]
+                    parent = node[3]
+                    nodes[id(parent)] = parent
+
+        return list(nodes.values())[0]
+
+
+    def truncate(self):
+        """Return ancestor of the best current node that precedes all states
+        and discard states which do not descend from it.
+
+        Bounds memory when segmentations fail to converge within `window`.
+
+        """
+        ancestor = self.bests[-1]
+        horizon = self.position - self.limit
+
+        while ancestor[1] > horizon and ancestor is not self.root:
+            ancestor = ancestor[3]
+
+        for table in self.states:
+            for word, node in list(table.items()):
+                while node[1] > ancestor[1]:
+                    node = node[3]
+                if node is not ancestor:
+                    del table[word]
+
+        self.bests.clear()
+        self.bests.extend(_top(table) for table in self.states)
+        return ancestor
+
+
+    def commit(self, node):
+        "Return words from the root to `node` and make `node` the root."
+        words = []
+        root = self.root
+        current = node
+
+        while current is not root:
+            words.append(current[2])
+            current = current[3]
+
+        words.reverse()
+        node[3] = None
+        self.root = node
+        return words
+
+
 _segmenter = Segmenter()        # pylint: disable=invalid-name
 clean = _segmenter.clean        # pylint: disable=invalid-name
 load = _segmenter.load          # pylint: disable=invalid-name
@@ -202,6 +630,27 @@ def main(arguments=()):
     import argparse
     import os
 
+    arguments = list(arguments)
+
+    if arguments[:1] == ['compile']:
+        parser = argparse.ArgumentParser(
+            prog='wordsegment compile',
+            description='Compile text files to a binary model',
+        )
+        parser.add_argument('outfile', nargs='?',
+                            default=Segmenter.MODEL_FILENAME)
+        parser.add_argument('--unigrams', default=Segmenter.UNIGRAMS_FILENAME)
+        parser.add_argument('--bigrams', default=Segmenter.BIGRAMS_FILENAME)
+        parser.add_argument('--words', default=Segmenter.WORDS_FILENAME)
+        args = parser.parse_args(arguments[1:])
+        segmenter = Segmenter()
+        segmenter.UNIGRAMS_FILENAME = args.unigrams
+        segmenter.BIGRAMS_FILENAME = args.bigrams
+        segmenter.WORDS_FILENAME = args.words
+        segmenter.load()
+        segmenter.compile(args.outfile)
+        return
+
     parser = argparse.ArgumentParser(description='English Word Segmentation')
     parser.add_argument('infile', nargs='?', type=argparse.FileType('r'),
                         default=sys.stdin)
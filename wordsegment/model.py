@@ -0,0 +1,424 @@
+"""Binary Model Format
+
+Compiled models hold the counts, scores and word list of a `Segmenter` in a
+single file that is memory-mapped when loaded. Startup does no parsing and
+processes that map the same file share its pages.
+
+Every word is stored once in a sorted string table and referred to by its
+index in that table. An open-addressing hash index keyed by CRC-32 maps
+words to indexes. Counts and log10 scores are packed float arrays. Bigrams
+are rows of next-word indexes sorted within each previous word so a row is
+searched by bisection.
+
+Memory-mapped models require Python 3.
+
+"""
+
+import array
+import bisect
+import math
+import mmap
+import struct
+import sys
+import zlib
+
+try:
+    from collections.abc import Mapping, Sequence
+except ImportError:  # pragma: no cover
+    from collections import Mapping, Sequence
+
+MAGIC = b'WSMODEL1'
+MARKER = 0x01020304
+HEADER = struct.Struct('=8sIIdIIIIIII4x')
+NAN = float('nan')
+
+
+def _align(size):
+    "Return `size` rounded up to a multiple of eight bytes."
+    return (size + 7) & ~7
+
+
+def _table(strings):
+    "Return `(offsets, blob)` pair encoding `strings` as a string table."
+    offsets = array.array('I', [0])
+    parts = []
+    size = 0
+    for string in strings:
+        data = string.encode('utf-8')
+        parts.append(data)
+        size += len(data)
+        offsets.append(size)
+    return offsets, b''.join(parts)
+
+
+def write(segmenter, filename):
+    "Write counts, scores and words of `segmenter` to `filename`."
+    unigram_scores, bigram_scores, _ = segmenter.tables()
+    unigrams = segmenter.unigrams
+    bigrams = [
+        (bigram.split(' ', 1), count)
+        for bigram, count in segmenter.bigrams.items()
+    ]
+
+    strings = set(unigrams)
+    strings.update(unigram_scores)
+    for pair, _ in bigrams:
+        strings.update(pair)
+    strings = sorted(strings)
+    ids = dict((string, ident) for ident, string in enumerate(strings))
+
+    string_offsets, string_blob = _table(strings)
+    counts = array.array('d', (unigrams.get(string, -1.0) for string in strings))
+    scores = array.array(
+        'd', (unigram_scores.get(string, NAN) for string in strings)
+    )
+
+    # Open addressing with linear probing. Slots hold the index plus one so
+    # zero marks an empty slot. At most half the slots are used.
+
+    size = 1
+    while size < 2 * len(strings):
+        size *= 2
+    mask = size - 1
+    slots = array.array('I', [0]) * size
+
+    for ident, string in enumerate(strings):
+        slot = zlib.crc32(string.encode('utf-8')) & mask
+        while slots[slot]:
+            slot = (slot + 1) & mask
+        slots[slot] = ident + 1
+
+    rows = sorted(
+        (ids[previous], ids[word], count, previous, word)
+        for (previous, word), count in bigrams
+    )
+    row_starts = array.array('I', [0]) * (len(strings) + 1)
+    for previous_id, _, _, _, _ in rows:
+        row_starts[previous_id + 1] += 1
+    for ident in range(len(strings)):
+        row_starts[ident + 1] += row_starts[ident]
+    next_ids = array.array('I', (row[1] for row in rows))
+    bigram_counts = array.array('d', (row[2] for row in rows))
+    bigram_score_values = array.array('d', (
+        bigram_scores.get(previous, {}).get(word, NAN)
+        for _, _, _, previous, word in rows
+    ))
+
+    word_offsets, word_blob = _table(segmenter.words)
+
+    header = HEADER.pack(
+        MAGIC, MARKER, segmenter.limit, segmenter.total, len(strings),
+        len(unigrams), len(rows), len(segmenter.words), size,
+        len(string_blob), len(word_blob),
+    )
+    sections = [
+        string_offsets.tobytes(), string_blob, counts.tobytes(),
+        scores.tobytes(), slots.tobytes(), row_starts.tobytes(),
+        next_ids.tobytes(), bigram_counts.tobytes(),
+        bigram_score_values.tobytes(), word_offsets.tobytes(), word_blob,
+    ]
+
+    with open(filename, 'wb') as writer:
+        writer.write(header)
+        for section in sections:
+            writer.write(section)
+            writer.write(b'\0' * (_align(len(section)) - len(section)))
+
+
+class Model(object):
+    """Model
+
+    Memory-mapped binary model written by `write`. Read-only views of the
+    counts and scores are available as attributes.
+
+    """
+    def __init__(self, filename):
+        with open(filename, 'rb') as reader:
+            self._mmap = mmap.mmap(reader.fileno(), 0, access=mmap.ACCESS_READ)
+
+        view = memoryview(self._mmap)
+        (magic, marker, self.limit, self.total, strings, unigrams, bigrams,
+         words, size, string_size, word_size) = HEADER.unpack_from(view)
+
+        if magic != MAGIC or marker != MARKER:
+            raise ValueError('{0} is not a compatible model'.format(filename))
+
+        offset = [HEADER.size]
+
+        def section(length, code=None):
+            "Return next section of `length` items of type `code`."
+            itemsize = struct.calcsize(code) if code else 1
+            start = offset[0]
+            offset[0] += _align(length * itemsize)
+            data = view[start:(start + length * itemsize)]
+            return data.cast(code) if code else data
+
+        self.string_offsets = section(strings + 1, 'I')
+        self.string_blob = section(string_size)
+        self.counts = section(strings, 'd')
+        self.scores = section(strings, 'd')
+        self.slots = section(size, 'I')
+        self.row_starts = section(strings + 1, 'I')
+        self.next_ids = section(bigrams, 'I')
+        self.bigram_counts = section(bigrams, 'd')
+        self.bigram_scores_data = section(bigrams, 'd')
+        self.word_offsets = section(words + 1, 'I')
+        self.word_blob = section(word_size)
+        self.size = strings
+        self.mask = size - 1
+
+        self.unigrams = Unigrams(self, unigrams)
+        self.bigrams = Bigrams(self, bigrams)
+        self.words = Words(self, words)
+        self.unigram_scores = UnigramScores(self)
+        self.bigram_scores = BigramScores(self)
+
+
+    def find(self, word):
+        "Return index of `word` in the string table or -1 if missing."
+        data = word.encode('utf-8')
+        length = len(data)
+        mask = self.mask
+        slots = self.slots
+        offsets = self.string_offsets
+        blob = self.string_blob
+        slot = zlib.crc32(data) & mask
+
+        while True:
+            ident = slots[slot]
+            if not ident:
+                return -1
+            ident -= 1
+            start = offsets[ident]
+            stop = offsets[ident + 1]
+            if stop - start == length and blob[start:stop] == data:
+                return ident
+            slot = (slot + 1) & mask
+
+
+    def string(self, ident):
+        "Return word at index `ident` of the string table."
+        offsets = self.string_offsets
+        data = self.string_blob[offsets[ident]:offsets[ident + 1]]
+        return data.tobytes().decode('utf-8')
+
+
+    def bigram(self, previous_id, word_id):
+        "Return position of bigram in bigram arrays or -1 if missing."
+        row_starts = self.row_starts
+        start = row_starts[previous_id]
+        stop = row_starts[previous_id + 1]
+        index = bisect.bisect_left(self.next_ids, word_id, start, stop)
+        if index < stop and self.next_ids[index] == word_id:
+            return index
+        return -1
+
+
+    def has_row(self, ident):
+        "Return True if the word at `ident` has bigram scores."
+        row_starts = self.row_starts
+        return (
+            row_starts[ident] < row_starts[ident + 1]
+            and self.counts[ident] >= 0.0
+        )
+
+
+class Unigrams(Mapping):
+    "Read-only mapping of unigram counts in a model."
+    def __init__(self, model, length):
+        self._model = model
+        self._length = length
+
+    def __getitem__(self, word):
+        ident = self._model.find(word)
+        if ident < 0 or self._model.counts[ident] < 0.0:
+            raise KeyError(word)
+        return self._model.counts[ident]
+
+    def get(self, word, default=None):
+        ident = self._model.find(word)
+        if ident < 0 or self._model.counts[ident] < 0.0:
+            return default
+        return self._model.counts[ident]
+
+    def __contains__(self, word):
+        ident = self._model.find(word)
+        return ident >= 0 and self._model.counts[ident] >= 0.0
+
+    def __iter__(self):
+        model = self._model
+        counts = model.counts
+        for ident in range(model.size):
+            if counts[ident] >= 0.0:
+                yield model.string(ident)
+
+    def __len__(self):
+        return self._length
+
+
+class Bigrams(Mapping):
+    "Read-only mapping of bigram counts in a model keyed by words joined by a space."
+    def __init__(self, model, length):
+        self._model = model
+        self._length = length
+
+    def _index(self, bigram):
+        model = self._model
+        previous, _, word = bigram.partition(' ')
+        previous_id = model.find(previous)
+        word_id = model.find(word)
+        if previous_id < 0 or word_id < 0:
+            return -1
+        return model.bigram(previous_id, word_id)
+
+    def __getitem__(self, bigram):
+        index = self._index(bigram)
+        if index < 0:
+            raise KeyError(bigram)
+        return self._model.bigram_counts[index]
+
+    def __contains__(self, bigram):
+        return self._index(bigram) >= 0
+
+    def __iter__(self):
+        model = self._model
+        row_starts = model.row_starts
+        next_ids = model.next_ids
+        for previous_id in range(model.size):
+            start = row_starts[previous_id]
+            stop = row_starts[previous_id + 1]
+            if start < stop:
+                previous = model.string(previous_id)
+                for index in range(start, stop):
+                    word = model.string(next_ids[index])
+                    yield '{0} {1}'.format(previous, word)
+
+    def __len__(self):
+        return self._length
+
+
+class Words(Sequence):
+    "Read-only sequence of words in a model."
+    def __init__(self, model, length):
+        self._model = model
+        self._length = length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[pos] for pos in range(*index.indices(self._length))]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('word index out of range')
+        offsets = self._model.word_offsets
+        data = self._model.word_blob[offsets[index]:offsets[index + 1]]
+        return data.tobytes().decode('utf-8')
+
+    def __len__(self):
+        return self._length
+
+
+class UnigramScores(Mapping):
+    "Read-only mapping of known words to log10 scores in a model."
+    def __init__(self, model):
+        self._model = model
+        self._length = sum(
+            1 for score in model.scores if not math.isnan(score)
+        )
+
+    def get(self, word, default=None):
+        ident = self._model.find(word)
+        if ident < 0:
+            return default
+        score = self._model.scores[ident]
+        return default if score != score else score
+
+    def __getitem__(self, word):
+        score = self.get(word)
+        if score is None:
+            raise KeyError(word)
+        return score
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __iter__(self):
+        model = self._model
+        scores = model.scores
+        for ident in range(model.size):
+            score = scores[ident]
+            if score == score:
+                yield model.string(ident)
+
+    def __len__(self):
+        return self._length
+
+
+class BigramScores(Mapping):
+    "Read-only mapping of previous words to rows of log10 bigram scores."
+    def __init__(self, model):
+        self._model = model
+
+    def get(self, word, default=None):
+        if word is None:
+            return default
+        model = self._model
+        ident = model.find(word)
+        if ident < 0 or not model.has_row(ident):
+            return default
+        return Row(model, ident)
+
+    def __getitem__(self, word):
+        row = self.get(word)
+        if row is None:
+            raise KeyError(word)
+        return row
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __iter__(self):
+        model = self._model
+        for ident in range(model.size):
+            if model.has_row(ident):
+                yield model.string(ident)
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+
+class Row(Mapping):
+    "Read-only mapping of next words to log10 bigram scores in a model."
+    def __init__(self, model, ident):
+        self._model = model
+        self._ident = ident
+
+    def get(self, word, default=None):
+        model = self._model
+        word_id = model.find(word)
+        if word_id < 0:
+            return default
+        index = model.bigram(self._ident, word_id)
+        if index < 0:
+            return default
+        return model.bigram_scores_data[index]
+
+    def __getitem__(self, word):
+        score = self.get(word)
+        if score is None:
+            raise KeyError(word)
+        return score
+
+    def __contains__(self, word):
+        return self.get(word) is not None
+
+    def __iter__(self):
+        model = self._model
+        start = model.row_starts[self._ident]
+        stop = model.row_starts[self._ident + 1]
+        for index in range(start, stop):
+            yield model.string(model.next_ids[index])
+
+    def __len__(self):
+        model = self._model
+        return model.row_starts[self._ident + 1] - model.row_starts[self._ident]